@@ -0,0 +1,86 @@
+"""对比 PrometheusRestClient 缓冲解析与流式解析的峰值内存(RSS)。
+
+每种模式在独立子进程中运行，响应体由 httpx.MockTransport 按需生成(不预先驻留内存)，
+因此 ru_maxrss 的增量即为该解析路径本身的峰值开销。
+
+用法:
+    python benchmarks/stream_rss.py --series 1000 --points 720
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "prometheus_mcp"))
+
+MODES = ["buffered", "stream", "stream-summary"]
+
+
+def _body(series: int, points: int) -> Iterator[bytes]:
+    yield b'{"status":"success","data":{"resultType":"matrix","result":['
+    for i in range(series):
+        item = {
+            "metric": {"__name__": "bench_metric", "instance": f"10.0.{i // 256}.{i % 256}:9100",
+                       "job": "bench"},
+            "values": [[1700000000 + j * 60, str(i + j * 0.5)] for j in range(points)],
+        }
+        yield (b"," if i else b"") + json.dumps(item).encode()
+    yield b"]}}"
+
+
+def _run_child(mode: str, series: int, points: int) -> None:
+    import httpx
+    from loguru import logger
+    from analyzer import summarize_series
+    from models import QueryParams
+    from prom_client import PrometheusRestClient
+
+    logger.remove()
+    client = PrometheusRestClient("http://bench")
+    client.client = httpx.Client(transport=httpx.MockTransport(
+        lambda req: httpx.Response(200, content=_body(series, points))))
+    qp = QueryParams(query="bench_metric", start=1700000000, end=1700000000 + points * 60,
+                     step="60s")
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if mode == "buffered":
+        data = client.execute(qp)
+    elif mode == "stream":
+        data = client.execute_stream(qp)
+    else:
+        data = client.execute_stream(qp, transform=summarize_series)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "size": len(data["result"]), "seconds": elapsed,
+                      "base_kb": before, "peak_kb": peak}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--series", type=int, default=1000)
+    ap.add_argument("--points", type=int, default=720)
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _run_child(args.child, args.series, args.points)
+        return
+    print(f"series={args.series} points={args.points}")
+    print(f"{'mode':<16}{'series':>8}{'seconds':>10}{'peak RSS(MB)':>14}{'delta(MB)':>12}")
+    for mode in MODES:
+        cmd = [sys.executable, __file__, "--child", mode,
+               "--series", str(args.series), "--points", str(args.points)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['mode']:<16}{r['size']:>8}{r['seconds']:>10.2f}{r['peak_kb'] / 1024:>14.1f}"
+              f"{(r['peak_kb'] - r['base_kb']) / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 from __future__ import annotations
-from typing import Dict, List
-from config import ConfigManager, QueryTemplate
-from models import AnalyzeRequest, AnalyzeResponse, QueryParams
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import AppInstance, ConfigManager, QueryTemplate
+from models import AnalyzeRequest, AnalyzeResponse, CompareRequest, CompareResponse, QueryParams
 from prom_client import PrometheusRestClient
+from utils import parse_duration_to_seconds
 from loguru import logger
 
+# 基线对比时并发执行查询的最大线程数
+_COMPARE_MAX_WORKERS = 8
+
 
 def render_labels(labels: Dict[str, str]) -> str:
     if not labels:
@@ -21,12 +27,105 @@ def apply_placeholders(text: str, labels: Dict[str, str], interval: str) -> str:
     return text.replace("{{labels}}", render_labels(labels)).replace("{{interval}}", interval)
 
 
+def series_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """按标签集合生成序列对齐键（与标签顺序无关）。"""
+    return tuple(sorted((labels or {}).items()))
+
+
+# 序列统计量: (样本数, 均值, 标准差)
+SeriesStats = Tuple[int, float, float]
+
+
+def summarize_series(item: Dict[str, Any]) -> SeriesStats:
+    """统计单条序列的 (样本数, 均值, 标准差)，忽略 NaN/Inf；
+    无有效样本返回 (0, nan, nan)，以便与“该窗口不存在此序列”(None) 区分。
+    支持 matrix(item.values) 与 vector(item.value) 两种结构。"""
+    pairs = item.get("values")
+    if pairs is None:
+        val = item.get("value")
+        pairs = [val] if isinstance(val, list) else []
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for pair in pairs:
+        try:
+            v = float(pair[1])
+        except Exception:
+            continue
+        if not math.isfinite(v):
+            continue
+        # Welford 单遍累计，避免先构造完整样本列表
+        n += 1
+        d = v - mean
+        mean += d / n
+        m2 += d * (v - mean)
+    if n == 0:
+        return 0, math.nan, math.nan
+    return n, mean, math.sqrt(m2 / n)
+
+
+def compare_series(current: Optional[SeriesStats], baselines: List[Optional[SeriesStats]],
+                   offsets: List[str], *, threshold: float,
+                   change_tolerance: float) -> Tuple[str, float, List[Dict[str, Any]]]:
+    """对比当前窗口与各基线窗口的统计量，返回 (status, score, 各基线明细)。
+    None 表示该窗口不存在此标签集合；样本数为 0 表示存在但无有效样本，不参与计算。
+    status:
+    - new: 基线窗口中均不存在；missing: 当前窗口不存在（两者 score 为 0）
+    - deviated: 某基线的 |z-score| >= threshold，score 为最大 |z-score|
+    - changed: 基线无波动(std=0)且相对变化超过 change_tolerance，score 为最大相对变化
+    - normal: 其它情况
+    """
+    details: List[Dict[str, Any]] = []
+    cur_mean = current[1] if current is not None and current[0] > 0 else None
+    z_max = 0.0
+    rel_max = 0.0
+    for off, base in zip(offsets, baselines):
+        if base is None or base[0] == 0:
+            details.append({"offset": off, "mean": None, "std": None,
+                            "delta": None, "ratio": None, "zscore": None})
+            continue
+        _, b_mean, b_std = base
+        delta = ratio = z = None
+        if cur_mean is not None:
+            delta = cur_mean - b_mean
+            ratio = cur_mean / b_mean if b_mean != 0 else None
+            if b_std > 0:
+                z = delta / b_std
+                z_max = max(z_max, abs(z))
+            elif delta != 0:
+                # 以两者中较大的绝对值为分母，基线为 0 时仍得到有限的相对变化
+                rel_max = max(rel_max, abs(delta) / max(abs(b_mean), abs(cur_mean)))
+        details.append({"offset": off, "mean": b_mean, "std": b_std,
+                        "delta": delta, "ratio": ratio, "zscore": z})
+    if current is None:
+        return "missing", 0.0, details
+    if all(b is None for b in baselines):
+        return "new", 0.0, details
+    if z_max >= threshold:
+        return "deviated", z_max, details
+    if rel_max > change_tolerance:
+        return "changed", rel_max, details
+    return "normal", z_max, details
+
+
 class AnalyzeService:
     def __init__(self, cfg: ConfigManager, client: PrometheusRestClient):
         self.cfg = cfg
         self.client = client
 
-    def execute_query(self, qt: QueryTemplate, labels: Dict[str, str], *, start=None, end=None, step=None, interval: str = "5m") -> Dict[str, any]:
+    def _find_instance(self, name: str) -> AppInstance:
+        gi = next((x for x in self.cfg.global_config.appInstances if x.name == name), None)
+        if gi is None:
+            logger.error(f"分析类型未找到 name={name}")
+            raise ValueError(f"AppInstance not found: {name}")
+        return gi
+
+    def execute_query(self, qt: QueryTemplate, labels: Dict[str, str], *, start=None, end=None,
+                      step=None, interval: str = "5m",
+                      transform: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                      max_series: Optional[int] = None) -> Dict[str, any]:
+        """执行单个查询模板；传入 transform 时走流式解析，每条序列到达即由 transform 汇总，
+        max_series 为流式解析的序列数预算。"""
         templ = qt.template or ""
         if not templ:
             logger.debug(f"跳过空模板 metric={qt.metric}")
@@ -38,7 +137,10 @@ class AnalyzeService:
         else:
             qp = QueryParams(query=q)
             logger.debug(f"执行瞬时分析查询 metric={qt.metric} interval={interval}")
-        data = self.client.execute(qp)
+        if transform is None:
+            data = self.client.execute(qp)
+        else:
+            data = self.client.execute_stream(qp, transform=transform, max_series=max_series)
         desc = qt.description or ""
         if desc:
             desc = apply_placeholders(desc, labels, interval)
@@ -50,10 +152,92 @@ class AnalyzeService:
 
     def get_report(self, req: AnalyzeRequest) -> AnalyzeResponse:
         logger.info(f"生成分析报告 name={req.name} range={(req.start is not None and req.end is not None and req.step is not None)} interval={req.interval}")
-        gi = next((x for x in self.cfg.global_config.appInstances if x.name == req.name), None)
-        if gi is None:
-            logger.error(f"分析类型未找到 name={req.name}")
-            raise ValueError(f"AppInstance not found: {req.name}")
+        gi = self._find_instance(req.name)
         is_range = req.start is not None and req.end is not None and req.step is not None
         results = self.execute_queries(gi.queryTemplates, req.labels, start=req.start, end=req.end, step=req.step, interval=req.interval or "5m")
         return AnalyzeResponse(name=gi.name, description=gi.description, rangeQuery=is_range, start=req.start, end=req.end, step=req.step, interval=req.interval, resultData=results)
+
+    def get_comparison(self, req: CompareRequest) -> CompareResponse:
+        """当前窗口 vs 偏移基线窗口对比：并发执行各窗口的模板查询，按标签集合对齐序列，
+        计算差值/比值/z-score。偏离超过阈值的序列按 |z-score| 降序返回，基线无波动但值变化、
+        新出现与消失的序列分别单独返回，各组均受 topK 限制并给出总数。"""
+        logger.info(f"生成基线对比报告 name={req.name} offsets={req.baselineOffsets} "
+                    f"threshold={req.threshold} interval={req.interval}")
+        gi = self._find_instance(req.name)
+        if req.start is None or req.end is None or req.step is None:
+            raise ValueError("基线对比需要范围查询参数 start/end/step")
+        if not req.baselineOffsets:
+            raise ValueError("baselineOffsets 不能为空")
+        shifts: List[int] = []
+        for off in req.baselineOffsets:
+            sec = int(parse_duration_to_seconds(off, 0.0))
+            if sec <= 0:
+                raise ValueError(f"无效的基线偏移: {off}")
+            shifts.append(sec)
+        interval = req.interval or "5m"
+        # 单调递增指标与基线的均值差恒定且远超窗口内波动，由模板 baselineCompare=false 排除
+        qts = [qt for qt in gi.queryTemplates if qt.template and qt.baselineCompare]
+        # 流式解析逐条汇总序列，不在内存中保留完整矩阵
+        def summarize(item: Dict[str, Any]) -> Tuple[Dict[str, str], SeriesStats]:
+            return item.get("metric") or {}, summarize_series(item)
+
+        windows = [0] + shifts
+        tasks = [(qt, shift) for qt in qts for shift in windows]
+        workers = max(1, min(_COMPARE_MAX_WORKERS, len(tasks)))
+        logger.debug(f"基线对比并发查询 tasks={len(tasks)} workers={workers}")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(self.execute_query, qt, req.labels,
+                            start=req.start - shift, end=req.end - shift, step=req.step,
+                            interval=interval, transform=summarize, max_series=req.maxSeries)
+                for qt, shift in tasks
+            ]
+            results = [f.result() for f in futures]
+
+        # 按 status 分组，各组独立排序并受 topK 限制，避免实例增减挤掉真正的偏离序列
+        groups: Dict[str, List[Dict[str, Any]]] = {
+            "deviated": [], "changed": [], "new": [], "missing": [],
+        }
+        total = 0
+        per_qt = len(windows)
+        for i, qt in enumerate(qts):
+            # 每个窗口: key -> (labels, 统计量)
+            window_stats: List[Dict[Tuple[Tuple[str, str], ...],
+                                    Tuple[Dict[str, str], SeriesStats]]] = []
+            for data in results[i * per_qt:(i + 1) * per_qt]:
+                stats = {}
+                for labels, summary in data.get("result") or []:
+                    stats[series_key(labels)] = (labels, summary)
+                window_stats.append(stats)
+            keys = set().union(*(w.keys() for w in window_stats))
+            total += len(keys)
+            for key in keys:
+                labels = next(w[key][0] for w in window_stats if key in w)
+                stats = [w[key][1] if key in w else None for w in window_stats]
+                status, score, details = compare_series(
+                    stats[0], stats[1:], req.baselineOffsets,
+                    threshold=req.threshold, change_tolerance=req.changeTolerance)
+                if status == "normal":
+                    continue
+                groups[status].append({
+                    "metric": qt.metric,
+                    "labels": labels,
+                    "score": score,
+                    "current": stats[0][1] if stats[0] is not None and stats[0][0] > 0 else None,
+                    "baselines": details,
+                })
+        truncated = any(data.get("truncated") for data in results)
+        if truncated:
+            logger.warning(f"基线对比存在被 maxSeries={req.maxSeries} 截断的查询窗口")
+        counts = {k: len(v) for k, v in groups.items()}
+        for k, items in groups.items():
+            items.sort(key=lambda d: d["score"], reverse=True)
+            if req.topK is not None:
+                groups[k] = items[:req.topK]
+        logger.info(f"基线对比完成 series={total} counts={counts}")
+        return CompareResponse(
+            name=gi.name, description=gi.description, start=req.start, end=req.end,
+            step=req.step, interval=req.interval, baselineOffsets=req.baselineOffsets,
+            threshold=req.threshold, totalSeries=total, deviations=groups["deviated"],
+            changed=groups["changed"], newSeries=groups["new"], missingSeries=groups["missing"],
+            counts=counts, truncated=truncated)
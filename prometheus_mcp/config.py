@@ -13,6 +13,9 @@ class QueryTemplate(BaseModel):
     metric: str
     description: Optional[str] = None
     template: str
+    # 是否参与基线对比；单调递增的指标(uptime、*_total 计数器原始值等)
+    # 窗口均值必然随偏移变化，应设为 false
+    baselineCompare: bool = True
 
 
 class AppInstance(BaseModel):
@@ -27,6 +30,8 @@ class PrometheusConfig(BaseModel):
     defaultStep: Optional[str] = None
     maxPoints: Optional[int] = None
     defaultInterval: Optional[str] = None
+    # 基线对比模式下每个查询窗口最多读取的序列数(流式解析预算)，省略则不限制
+    maxSeries: Optional[int] = None
 
 
 class LokiConfig(BaseModel):
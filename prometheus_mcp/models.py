@@ -42,3 +42,43 @@ class AnalyzeResponse(BaseModel):
     interval: Optional[str] = None  # 新增：返回使用的 interval
     # 每项 = { description: str, resultType: str, result: list }
     resultData: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class CompareRequest(AnalyzeRequest):
+    """基线对比请求：在 AnalyzeRequest 基础上增加偏移基线窗口。
+    - baselineOffsets: 基线相对当前窗口的偏移，如 ["1d", "7d"]
+    - threshold: |z-score| 超过该阈值的序列才会返回
+    - topK: 每组（偏离/变化/新增/消失）最多返回的序列数
+    - changeTolerance: 基线无波动时，相对变化超过该比例才视为 changed
+    - maxSeries: 每个查询窗口最多读取的序列数，超出部分不参与对比
+    """
+    baselineOffsets: List[str] = Field(default_factory=lambda: ["1d"])
+    threshold: float = Field(default=3.0, gt=0)
+    topK: Optional[int] = Field(default=20, ge=1)
+    changeTolerance: float = Field(default=0.01, ge=0)
+    maxSeries: Optional[int] = Field(default=None, ge=1)
+
+
+class CompareResponse(BaseModel):
+    name: str
+    description: Optional[str] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    step: Optional[str] = None
+    interval: Optional[str] = None
+    baselineOffsets: List[str] = Field(default_factory=list)
+    threshold: float = 3.0
+    # 参与对比的序列总数（按 metric + 标签集合去重）
+    totalSeries: int = 0
+    # 每项 = { metric, labels, score, current, baselines: [...] }，按 score 降序
+    # |z-score| >= threshold 的序列，score 为最大 |z-score|
+    deviations: List[Dict[str, Any]] = Field(default_factory=list)
+    # 基线无波动(std=0)但相对变化超过 changeTolerance 的序列，score 为最大相对变化
+    changed: List[Dict[str, Any]] = Field(default_factory=list)
+    # 仅在当前窗口 / 仅在基线窗口中出现的序列
+    newSeries: List[Dict[str, Any]] = Field(default_factory=list)
+    missingSeries: List[Dict[str, Any]] = Field(default_factory=list)
+    # 各组截断前的总数: { deviated, changed, new, missing }
+    counts: Dict[str, int] = Field(default_factory=dict)
+    # 是否有查询窗口因 maxSeries 被截断（此时 new/missing 可能不准确）
+    truncated: bool = False
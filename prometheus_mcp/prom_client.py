@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
+import re
 import httpx
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List, Tuple
 from datetime import datetime, timedelta,UTC
 
 from models import QueryParams
@@ -9,6 +11,152 @@ from utils import parse_duration_to_seconds
 from loguru import logger
 
 
+# 流式解析：定位 data.result 数组起点及其前缀中的 status/resultType
+_RESULT_START_RE = re.compile(r'"result"\s*:\s*\[')
+_STATUS_RE = re.compile(r'"status"\s*:\s*"(\w+)"')
+_RESULT_TYPE_RE = re.compile(r'"resultType"\s*:\s*"(\w+)"')
+# 结构扫描：字符串外只关心引号与括号；字符串内跳过普通字符与转义对
+_STRUCT_RE = re.compile(r'["\[\]{}]')
+_STR_BODY_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+_SEP_RE = re.compile(r'[\s,]*')
+# 超过该长度仍未找到 result 数组起点，则放弃流式解析，整体缓冲
+_HEAD_LIMIT = 64 * 1024
+
+
+class _SeriesStreamParser:
+    """增量解析 Prometheus 查询响应，逐条产出 data.result 中的序列对象。
+    仅对 matrix/vector 结果流式解析；其它情况（scalar/string、非 success、
+    或前缀中找不到 result 数组）退化为整体缓冲，由 close() 返回完整 JSON。
+    扫描状态(括号深度、是否在字符串内、是否处于转义)跨分片保留，每个分片只扫描一次；
+    未完成序列以分片列表暂存，收到闭合括号时才拼接解析。
+    """
+
+    def __init__(self) -> None:
+        self.state = "head"  # head -> array -> done；或 head -> fallback
+        self.result_type = ""
+        self._buf = ""  # head 状态下的前缀文本
+        self._parts: List[str] = []  # fallback 状态下的原始分片
+        self._pending: List[str] = []  # 当前未完成序列的分片
+        self._in_elem = False
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        if self.state == "done":
+            return []
+        if self.state == "fallback":
+            self._parts.append(chunk)
+            return []
+        if self.state == "head":
+            self._buf += chunk
+            self._parse_head()
+            if self.state != "array":
+                return []
+            chunk, self._buf = self._buf, ""
+        return self._parse_array(chunk)
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """结束解析。退化为整体缓冲时返回完整响应 JSON，流式完成时返回 None。"""
+        if self.state == "done":
+            return None
+        if self.state == "array":
+            raise RuntimeError("Prometheus 响应不完整: result 数组未结束")
+        text = "".join(self._parts) if self.state == "fallback" else self._buf
+        self._parts = []
+        self._buf = ""
+        return json.loads(text)
+
+    def _parse_head(self) -> None:
+        m = _RESULT_START_RE.search(self._buf)
+        if m is None:
+            if len(self._buf) > _HEAD_LIMIT:
+                self._to_fallback()
+            return
+        prefix = self._buf[:m.start()]
+        status = _STATUS_RE.search(prefix)
+        rtype = _RESULT_TYPE_RE.search(prefix)
+        if (status is not None and status.group(1) != "success") or rtype is None \
+                or rtype.group(1) not in ("matrix", "vector"):
+            self._to_fallback()
+            return
+        self.result_type = rtype.group(1)
+        self.state = "array"
+        # 剩余部分交由 feed 作为数组的第一个分片处理
+        self._buf = self._buf[m.end():]
+
+    def _to_fallback(self) -> None:
+        self.state = "fallback"
+        self._parts = [self._buf]
+        self._buf = ""
+
+    def _parse_array(self, text: str) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        pos = 0
+        start = 0  # 当前序列在本分片中的起点
+        while True:
+            if not self._in_elem:
+                pos = _SEP_RE.match(text, pos).end()
+                if pos >= len(text):
+                    return items
+                if text[pos] == "]":
+                    self.state = "done"
+                    return items
+                if text[pos] != "{":
+                    raise RuntimeError(
+                        f"Prometheus 响应格式异常: result 元素非对象 ({text[pos:pos + 20]!r})")
+                self._in_elem = True
+                start = pos
+            end = self._scan(text, pos)
+            if end is None:
+                self._pending.append(text[start:])
+                return items
+            self._pending.append(text[start:end])
+            items.append(json.loads("".join(self._pending)))
+            self._pending = []
+            self._in_elem = False
+            pos = end
+
+    def _scan(self, text: str, pos: int) -> Optional[int]:
+        """从 pos 继续扫描当前序列，返回闭合括号之后的位置；分片内未闭合返回 None。"""
+        n = len(text)
+        while pos < n:
+            if self._in_str:
+                if self._esc:
+                    # 上一分片以反斜杠结尾，跳过被转义的字符
+                    self._esc = False
+                    pos += 1
+                    continue
+                pos = _STR_BODY_RE.match(text, pos).end()
+                if pos >= n:
+                    return None
+                if text[pos] == "\\":
+                    # 反斜杠位于分片末尾
+                    self._esc = True
+                else:
+                    self._in_str = False
+                pos += 1
+                continue
+            m = _STRUCT_RE.search(text, pos)
+            if m is None:
+                return None
+            pos = m.end()
+            ch = m.group(0)
+            if ch == '"':
+                self._in_str = True
+            elif ch in "[{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+        return None
+
+
 class PrometheusRestClient:
     def __init__(self, base_url: str, request_timeout: Optional[str] = None):
         self.base_url = base_url.rstrip("/")
@@ -71,8 +219,8 @@ class PrometheusRestClient:
             # 其它类型(如 scalar/string)暂不处理
             pass
 
-    def execute(self, qp: QueryParams) -> Dict[str, Any]:
-        """根据 QueryParams 判定执行瞬时或范围查询，返回 {'resultType','result'}，并将时间戳转为北京时间。"""
+    def _build_request(self, qp: QueryParams) -> Tuple[str, Dict[str, Any]]:
+        """根据 QueryParams 判定瞬时或范围查询，返回 (endpoint, params)。"""
         is_range = qp.start is not None and qp.end is not None and qp.step is not None
         if is_range:
             params: Dict[str, Any] = {
@@ -87,7 +235,15 @@ class PrometheusRestClient:
                 params["time"] = qp.time
         self._apply_optional(params, timeout=qp.timeout, limit=qp.limit)
         endpoint = "/api/v1/query_range" if is_range else "/api/v1/query"
-        logger.debug(f"执行{'范围' if is_range else '瞬时'}查询 endpoint={endpoint} params={{k: params[k] for k in params if k!='query'}} query={qp.query[:120]}")
+        logger.debug(f"执行{'范围' if is_range else '瞬时'}查询 endpoint={endpoint} "
+                     f"params={{k: params[k] for k in params if k!='query'}} "
+                     f"query={qp.query[:120]}")
+        return endpoint, params
+
+    def execute(self, qp: QueryParams) -> Dict[str, Any]:
+        """根据 QueryParams 判定执行瞬时或范围查询，返回 {'resultType','result'}，
+        并将时间戳转为北京时间。"""
+        endpoint, params = self._build_request(qp)
         r = self.client.get(f"{self.base_url}{endpoint}", params=params)
         try:
             r.raise_for_status()
@@ -102,3 +258,70 @@ class PrometheusRestClient:
         result_len = len(result_list) if result_list else 0
         logger.info(f"查询完成 type={result_type} size={result_len}")
         return {"resultType": result_type, "result": result_list}
+
+    def execute_stream(self, qp: QueryParams, *,
+                       transform: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                       max_series: Optional[int] = None,
+                       max_samples: Optional[int] = None) -> Dict[str, Any]:
+        """流式执行查询：边接收响应边逐条解析 data.result，不构造完整响应树。
+        - transform: 对每条原始序列(未转换时间戳)调用，结果代替序列放入 result，可用于就地汇总；
+          省略则与 execute 一致，将时间戳转为北京时间后保留原序列。
+        - max_series / max_samples: 序列数 / 样本数预算，达到后提前结束读取并标记 truncated。
+          基线对比模式通过配置 prometheusConfig.maxSeries 使用 max_series；
+          max_samples 目前仅供库调用方使用。
+        返回 {'resultType','result','truncated'}。
+        """
+        endpoint, params = self._build_request(qp)
+        parser = _SeriesStreamParser()
+        result_list: List[Any] = []
+        samples = 0
+        truncated = False
+
+        def accept(result_type: str, item: Dict[str, Any]) -> bool:
+            nonlocal samples, truncated
+            if result_type == "matrix":
+                n = len(item.get("values") or []) + len(item.get("histograms") or [])
+            else:
+                n = 1
+            if (max_series is not None and len(result_list) >= max_series) or \
+                    (max_samples is not None and samples + n > max_samples):
+                truncated = True
+                return False
+            samples += n
+            if transform is not None:
+                result_list.append(transform(item))
+            else:
+                self._convert_timestamps(result_type, [item])
+                result_list.append(item)
+            return True
+
+        resp_json = None
+        with self.client.stream("GET", f"{self.base_url}{endpoint}", params=params) as r:
+            try:
+                r.raise_for_status()
+                for chunk in r.iter_text():
+                    for item in parser.feed(chunk):
+                        if not accept(parser.result_type, item):
+                            break
+                    if truncated or parser.done:
+                        break
+                if not truncated:
+                    resp_json = parser.close()
+            except Exception:
+                logger.exception("Prometheus 流式查询失败")
+                raise
+        result_type = parser.result_type
+        if resp_json is not None:
+            # 退化路径：整体解析后按相同规则处理
+            data = self._extract_data(resp_json)
+            result_type = data.get("resultType", "")
+            raw = data.get("result", [])
+            if result_type in ("matrix", "vector") and isinstance(raw, list):
+                for item in raw:
+                    if not accept(result_type, item):
+                        break
+            else:
+                result_list = raw
+        logger.info(f"流式查询完成 type={result_type} size={len(result_list)} samples={samples} "
+                    f"truncated={truncated}")
+        return {"resultType": result_type, "result": result_list, "truncated": truncated}
@@ -6,7 +6,7 @@ from fastmcp import FastMCP
 
 from analyzer import AnalyzeService
 from config import ConfigManager
-from models import AnalyzeRequest, QueryParams
+from models import AnalyzeRequest, CompareRequest, QueryParams
 from prom_client import PrometheusRestClient
 from utils import compute_adaptive_step
 from loguru import logger
@@ -85,9 +85,28 @@ def analyze(
     start: Annotated[int, "范围查询起始时间戳(秒)"],
     end: Annotated[int, "范围查询结束时间戳(秒)"],
     interval: Annotated[Optional[str], "范围向量窗口大小(用于替换模板 {{interval}})，省略则使用配置 defaultInterval"] = None,
+    baseline_offsets: Annotated[
+        Optional[List[str]],
+        "基线对比模式：基线窗口相对当前窗口的偏移，如 ['1d','1w'] 表示与昨天、上周同时段对比；"
+        "单位支持 ms/s/m/h/d/w/y(y=365d)；省略则返回原始指标数据",
+    ] = None,
+    threshold: Annotated[
+        Optional[float],
+        "基线对比模式：|z-score| 阈值(须 > 0)，仅返回偏离超过该值的序列，默认 3",
+    ] = None,
+    top_k: Annotated[
+        Optional[int],
+        "基线对比模式：偏离/变化/新增/消失各组最多返回的序列数(须 >= 1)，默认 20",
+    ] = None,
 ) -> Dict[str, Any]:
-    """Prometheus指标查询，根据分析类型和目标实例，执行预定义的PromQL查询预设，返回查询到的指标数据。"""
-    logger.info(f"调用 analyze name={name} start={start} end={end} interval={interval} (自适应步长)")
+    """Prometheus指标查询，根据分析类型和目标实例，执行预定义的PromQL查询预设，
+    返回查询到的指标数据。
+    若传入 baseline_offsets，则进入基线对比模式：同时查询当前窗口与偏移基线窗口，
+    按标签对齐序列，仅返回相对基线明显异常的序列（含均值、差值、比值、z-score），
+    按偏离程度排序；新出现(newSeries)、消失(missingSeries)及基线无波动但值变化(changed)
+    的序列单独列出，counts 给出各组总数。"""
+    logger.info(f"调用 analyze name={name} start={start} end={end} interval={interval} "
+                f"baseline_offsets={baseline_offsets} (自适应步长)")
     if end <= start:
         return {"error": "end 必须大于 start"}
     cfg = ConfigManager.load()
@@ -100,6 +119,21 @@ def analyze(
         request_timeout=pcfg.queryTimeout,
     )
     srv = AnalyzeService(cfg, client)
+    if baseline_offsets:
+        extra: Dict[str, Any] = {}
+        if threshold is not None:
+            extra["threshold"] = threshold
+        if top_k is not None:
+            extra["topK"] = top_k
+        try:
+            # pydantic ValidationError 为 ValueError 子类，参数越界同样以 error 返回
+            creq = CompareRequest(name=name, labels=labels or {}, start=start, end=end, step=step,
+                                  interval=eff_interval, baselineOffsets=baseline_offsets,
+                                  maxSeries=pcfg.maxSeries, **extra)
+            cresp = srv.get_comparison(creq)
+        except ValueError as e:
+            return {"error": str(e)}
+        return cresp.model_dump()
     resp = srv.get_report(AnalyzeRequest(name=name, labels=labels or {}, start=start, end=end, step=step, interval=eff_interval))
     out = resp.model_dump()
     out["step"] = step
@@ -23,6 +23,10 @@ def parse_duration_to_seconds(text: str | None, default: float = 30.0) -> float:
             return float(t[:-1]) * 3600.0
         if t.endswith("d"):
             return float(t[:-1]) * 86400.0
+        if t.endswith("w"):
+            return float(t[:-1]) * 604800.0
+        if t.endswith("y"):
+            return float(t[:-1]) * 31536000.0
         return float(t)
     except Exception:
         return default
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模块间使用扁平导入(from models import ...)，与 server.py 的运行方式保持一致
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "prometheus_mcp"))
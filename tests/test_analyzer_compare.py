@@ -0,0 +1,157 @@
+import math
+
+import httpx
+import pytest
+
+from analyzer import AnalyzeService, compare_series, summarize_series
+from config import AppInstance, ConfigManager, GlobalConfig, PrometheusConfig, QueryTemplate
+from models import CompareRequest
+from prom_client import PrometheusRestClient
+from utils import parse_duration_to_seconds
+
+START, END = 1_700_000_000, 1_700_000_600
+DAY, WEEK = 86400, 604800
+
+
+def _series(labels: dict, values: list) -> dict:
+    return {"metric": labels, "values": [[START + i * 60, str(v)] for i, v in enumerate(values)]}
+
+
+def _service(windows: dict, templates: list | None = None) -> tuple[AnalyzeService, list]:
+    """windows: 偏移秒数 -> 该窗口返回的序列列表；按请求的 start 选择窗口。"""
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        shift = START - int(request.url.params["start"])
+        requested.append(shift)
+        result = windows.get(shift, [])
+        return httpx.Response(200, json={"status": "success",
+                                         "data": {"resultType": "matrix", "result": result}})
+
+    cfg = ConfigManager(global_config=GlobalConfig(
+        prometheusConfig=PrometheusConfig(baseUrl="http://prom"),
+        appInstances=[AppInstance(name="app", queryTemplates=templates or [
+            QueryTemplate(metric="m", template="m{{labels}}"),
+        ])],
+    ))
+    client = PrometheusRestClient("http://prom")
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return AnalyzeService(cfg, client), requested
+
+
+def _compare(srv: AnalyzeService, **kwargs):
+    kwargs.setdefault("baselineOffsets", ["1d"])
+    req = CompareRequest(name="app", start=START, end=END, step="60s", **kwargs)
+    return srv.get_comparison(req)
+
+
+FLAT = [10, 11, 12, 10, 11, 12]
+
+
+def test_parse_duration_week_and_year():
+    assert parse_duration_to_seconds("1w", 0.0) == WEEK
+    assert parse_duration_to_seconds("1y", 0.0) == 365 * DAY
+    assert parse_duration_to_seconds("abc", 0.0) == 0.0
+
+
+def test_summarize_series():
+    n, mean, std = summarize_series(_series({}, [1, 2, 3, "NaN", "+Inf"]))
+    assert (n, mean) == (3, 2.0)
+    assert std == pytest.approx(math.sqrt(2 / 3))
+    assert summarize_series({"value": [START, "5"]}) == (1, 5.0, 0.0)
+    n, mean, _ = summarize_series(_series({}, ["NaN", "NaN"]))
+    assert n == 0 and math.isnan(mean)
+
+
+@pytest.mark.parametrize("cur_mean, expected", [(11.0 + 2.9, "normal"), (11.0 + 3.1, "deviated")])
+def test_compare_series_threshold(cur_mean, expected):
+    status, score, details = compare_series((6, cur_mean, 0.5), [(6, 11.0, 1.0)], ["1d"],
+                                            threshold=3.0, change_tolerance=0.01)
+    assert status == expected
+    assert details[0]["zscore"] == pytest.approx(cur_mean - 11.0)
+
+
+@pytest.mark.parametrize("cur, base, expected", [
+    (2.0, 1.0, "changed"),
+    (1.0000001, 1.0, "normal"),
+    (5.0, 0.0, "changed"),
+    (0.0, 0.0, "normal"),
+])
+def test_compare_series_flat_baseline(cur, base, expected):
+    status, score, details = compare_series((6, cur, 0.0), [(6, base, 0.0)], ["1d"],
+                                            threshold=3.0, change_tolerance=0.01)
+    assert status == expected
+    assert math.isfinite(score)
+    if base == 0:
+        assert details[0]["ratio"] is None
+
+
+def test_alignment_ignores_label_order():
+    srv, _ = _service({
+        0: [_series({"a": "1", "b": "2"}, FLAT)],
+        DAY: [_series({"b": "2", "a": "1"}, FLAT)],
+    })
+    resp = _compare(srv)
+    assert resp.totalSeries == 1
+    assert resp.counts == {"deviated": 0, "changed": 0, "new": 0, "missing": 0}
+
+
+def test_groups_new_missing_and_deviated():
+    srv, _ = _service({
+        0: [_series({"i": "spike"}, [v * 10 for v in FLAT]), _series({"i": "fresh"}, FLAT)],
+        DAY: [_series({"i": "spike"}, FLAT), _series({"i": "gone"}, FLAT)],
+    })
+    resp = _compare(srv)
+    assert [d["labels"] for d in resp.deviations] == [{"i": "spike"}]
+    assert [d["labels"] for d in resp.newSeries] == [{"i": "fresh"}]
+    assert [d["labels"] for d in resp.missingSeries] == [{"i": "gone"}]
+    assert resp.missingSeries[0]["current"] is None
+
+
+def test_all_nan_series_is_neither_new_nor_missing():
+    nan = ["NaN"] * 6
+    srv, _ = _service({
+        0: [_series({"i": "a"}, nan), _series({"i": "b"}, FLAT)],
+        DAY: [_series({"i": "a"}, FLAT), _series({"i": "b"}, nan)],
+    })
+    resp = _compare(srv)
+    assert resp.counts == {"deviated": 0, "changed": 0, "new": 0, "missing": 0}
+
+
+def test_top_k_is_applied_per_group_with_precut_counts():
+    current = [_series({"i": f"d{k}"}, [v + 10 * (k + 1) for v in FLAT]) for k in range(4)]
+    current += [_series({"i": f"n{k}"}, FLAT) for k in range(5)]
+    baseline = [_series({"i": f"d{k}"}, FLAT) for k in range(4)]
+    srv, _ = _service({0: current, DAY: baseline})
+    resp = _compare(srv, topK=2)
+    assert resp.counts == {"deviated": 4, "changed": 0, "new": 5, "missing": 0}
+    assert [d["labels"]["i"] for d in resp.deviations] == ["d3", "d2"]
+    assert len(resp.newSeries) == 2
+
+
+@pytest.mark.parametrize("offset", ["abc", "0s", "-1d"])
+def test_rejects_bad_offsets(offset):
+    srv, _ = _service({})
+    with pytest.raises(ValueError):
+        _compare(srv, baselineOffsets=[offset])
+
+
+@pytest.mark.parametrize("kwargs", [{"topK": 0}, {"topK": -1}, {"threshold": 0}])
+def test_rejects_bad_limits(kwargs):
+    with pytest.raises(ValueError):
+        CompareRequest(name="app", **kwargs)
+
+
+def test_week_and_year_offsets_shift_the_window():
+    srv, requested = _service({})
+    _compare(srv, baselineOffsets=["1w", "1y"])
+    assert sorted(requested) == [0, WEEK, 365 * DAY]
+
+
+def test_templates_can_opt_out():
+    srv, requested = _service({}, templates=[
+        QueryTemplate(metric="uptime", template="up{{labels}}", baselineCompare=False),
+        QueryTemplate(metric="m", template="m{{labels}}"),
+    ])
+    _compare(srv)
+    assert len(requested) == 2
@@ -0,0 +1,116 @@
+import json
+
+import httpx
+import pytest
+
+from models import QueryParams
+from prom_client import PrometheusRestClient, _SeriesStreamParser
+
+
+def _matrix_body(series: int = 3, points: int = 4) -> dict:
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {
+                    "metric": {"instance": f'node-{i}', "note": 'a"]}{[\\ 中文'},
+                    "values": [[1700000000 + j * 60, str(i + j)] for j in range(points)],
+                }
+                for i in range(series)
+            ],
+        },
+    }
+
+
+def _feed(text: str, size: int) -> tuple[_SeriesStreamParser, list]:
+    parser = _SeriesStreamParser()
+    items = []
+    for i in range(0, len(text), size):
+        items += parser.feed(text[i:i + size])
+    return parser, items
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_parser_matches_full_parse_for_any_chunking(size):
+    body = _matrix_body()
+    parser, items = _feed(json.dumps(body, ensure_ascii=False), size)
+    assert parser.done
+    assert parser.close() is None
+    assert items == body["data"]["result"]
+
+
+def test_parser_string_split_mid_escape():
+    body = _matrix_body(series=1)
+    text = json.dumps(body)
+    cut = text.index('\\"') + 1  # 分片恰好落在转义反斜杠之后
+    parser = _SeriesStreamParser()
+    items = parser.feed(text[:cut]) + parser.feed(text[cut:])
+    assert parser.done
+    assert items == body["data"]["result"]
+
+
+def test_parser_brackets_inside_strings():
+    body = _matrix_body(series=2)
+    body["data"]["result"][0]["metric"]["expr"] = "sum(rate(x[5m])) by (a) {b=\"}\"}"
+    parser, items = _feed(json.dumps(body), 5)
+    assert items == body["data"]["result"]
+
+
+@pytest.mark.parametrize("body", [
+    {"status": "success", "data": {"resultType": "scalar", "result": [1700000000, "1.5"]}},
+    {"status": "error", "errorType": "bad_data", "error": "parse error"},
+])
+def test_parser_falls_back_to_full_parse(body):
+    parser, items = _feed(json.dumps(body), 4)
+    assert items == []
+    assert not parser.done
+    assert parser.close() == body
+
+
+def test_parser_rejects_truncated_array():
+    text = json.dumps(_matrix_body())
+    parser, _ = _feed(text[:-10], 16)
+    with pytest.raises(RuntimeError):
+        parser.close()
+
+
+def _client(body: dict, chunk: int = 50) -> PrometheusRestClient:
+    text = json.dumps(body).encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=(text[i:i + chunk] for i in range(0, len(text), chunk)))
+
+    client = PrometheusRestClient("http://prom")
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return client
+
+
+QP = QueryParams(query="up", start=1700000000, end=1700000300, step="60s")
+
+
+def test_execute_stream_matches_execute():
+    body = _matrix_body()
+    streamed = _client(body).execute_stream(QP)
+    buffered = _client(body).execute(QP)
+    assert streamed["truncated"] is False
+    assert streamed["resultType"] == buffered["resultType"]
+    assert streamed["result"] == buffered["result"]
+
+
+def test_execute_stream_max_series():
+    out = _client(_matrix_body(series=5)).execute_stream(QP, max_series=2)
+    assert out["truncated"] is True
+    assert [s["metric"]["instance"] for s in out["result"]] == ["node-0", "node-1"]
+
+
+def test_execute_stream_max_samples():
+    client = _client(_matrix_body(series=5, points=4))
+    out = client.execute_stream(QP, max_samples=10, transform=lambda s: len(s["values"]))
+    assert out["truncated"] is True
+    assert out["result"] == [4, 4]
+
+
+def test_execute_stream_error_response():
+    with pytest.raises(RuntimeError):
+        _client({"status": "error", "errorType": "bad_data", "error": "x"}).execute_stream(QP)